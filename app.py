@@ -1,11 +1,13 @@
+import orjson
 import requests
 import pandas as pd
 import streamlit as st
 from datetime import datetime
 from geopy.geocoders import Nominatim
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import norm
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from matplotlib.figure import Figure
 import io
 import zipfile
 
@@ -166,7 +168,6 @@ with st.sidebar:
     var = VAR_INFO[var_choice]["code"]
     unit = VAR_INFO[var_choice]["unit"]
 
-    date_in = st.date_input("Day of Year", datetime.today())
     run = st.button("Run Weather Analysis")
 
 # Intro screen
@@ -185,10 +186,14 @@ Use it to build **intuition and risk awareness**, not daily forecasts.
     st.stop()
 
 # Geocoding
-@st.cache_data
+@st.cache_resource
+def get_geolocator():
+    # Shared across sessions so the HTTP session is reused; do not mutate
+    return Nominatim(user_agent="nasa_weather_app")
+
+@st.cache_data(ttl="30d", max_entries=256)
 def geocode_location(city):
-    geolocator = Nominatim(user_agent="nasa_weather_app")
-    loc = geolocator.geocode(city, timeout=10)
+    loc = get_geolocator().geocode(city, timeout=10)
     if loc:
         return loc.latitude, loc.longitude
     return 24.8607, 67.0011
@@ -196,7 +201,16 @@ def geocode_location(city):
 lat, lon = geocode_location(location_input)
 
 # NASA POWER Data Fetcher
-@st.cache_data(show_spinner=False)
+# Grid cell size and first cell centre (lat, lon) in degrees: 1/2 x 5/8 MERRA-2
+# cells for meteorology, 1 x 1 cells centred on half degrees for solar
+POWER_GRID = {"ALLSKY_SFC_SW_DWN": ((1.0, 0.5), (1.0, 0.5))}
+
+def snap_to_power_grid(lat, lon, parameter):
+    # Every point in a cell gets identical data, so key the caches on the cell
+    # centre; this also bounds the disk cache to one entry per cell
+    (dlat, olat), (dlon, olon) = POWER_GRID.get(parameter, ((0.5, 0.0), (0.625, 0.0)))
+    return olat + round((lat - olat) / dlat) * dlat, olon + round((lon - olon) / dlon) * dlon
+
 def fetch_power_point(lat, lon, start_year, end_year, parameter):
     url = "https://power.larc.nasa.gov/api/temporal/daily/point"
     params = {
@@ -210,37 +224,135 @@ def fetch_power_point(lat, lon, start_year, end_year, parameter):
     }
     r = requests.get(url, params=params, timeout=30)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
+
+# Finished years never change, so they are persisted across restarts.
+# Streamlit never expires disk entries, hence no ttl here.
+@st.cache_data(show_spinner=False, persist="disk")
+def fetch_power_archive(lat, lon, start_year, end_year, parameter):
+    return fetch_power_point(lat, lon, start_year, end_year, parameter)
+
+# The current year keeps growing, so it stays in memory and refreshes daily
+@st.cache_data(show_spinner=False, ttl="24h", max_entries=128)
+def fetch_power_current(lat, lon, year, parameter):
+    return fetch_power_point(lat, lon, year, year, parameter)
+
+def _power_series(json_resp, parameter):
+    return json_resp.get("properties", {}).get("parameter", {}).get(parameter, {})
+
+@st.cache_data(show_spinner=False, ttl="24h", max_entries=32)
+def build_dataframe(lat, lon, start_year, end_year, parameter):
+    data = {
+        **_power_series(fetch_power_archive(lat, lon, start_year, end_year - 1, parameter), parameter),
+        **_power_series(fetch_power_current(lat, lon, end_year, parameter), parameter),
+    }
+    dates = pd.to_datetime(np.fromiter(data.keys(), dtype="U8"), format="%Y%m%d")
+    values = np.fromiter(data.values(), dtype=np.float64, count=len(data))
+    df = pd.DataFrame({"date": dates, "doy": dates.dayofyear, parameter: values})
+    # POWER returns dates in order; only sort if that ever changes
+    if not df["date"].is_monotonic_increasing:
+        df = df.sort_values("date").reset_index(drop=True)
+    return df
+
+@st.cache_data(show_spinner=False, ttl="24h", max_entries=32)
+def doy_index(lat, lon, start_year, end_year, parameter):
+    df = build_dataframe(lat, lon, start_year, end_year, parameter)
+    return df.groupby("doy").indices
+
+@st.cache_data(show_spinner=False, ttl="24h", max_entries=32)
+def doy_stats(lat, lon, start_year, end_year, parameter):
+    # Rows are day-of-year 1..366: mean, std, max, min, slope, p_extreme
+    df = build_dataframe(lat, lon, start_year, end_year, parameter)
+    v = df[parameter].to_numpy()
+    valid = ~np.isnan(v)
+    v = v[valid]
+    doy = df["doy"].to_numpy()[valid] - 1
+    year = df["date"].dt.year.to_numpy(dtype=np.float64)[valid]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = np.bincount(doy, minlength=366)
+        mean = np.bincount(doy, v, 366) / n
+        std = np.sqrt(np.maximum(np.bincount(doy, v * v, 366) / n - mean * mean, 0.0))
+        vmax = np.full(366, np.nan)
+        vmin = np.full(366, np.nan)
+        vmax[n > 0], vmin[n > 0] = -np.inf, np.inf
+        np.maximum.at(vmax, doy, v)
+        np.minimum.at(vmin, doy, v)
+
+        # Least-squares slope per day: cov(year, v) / var(year)
+        dx = year - (np.bincount(doy, year, 366) / n)[doy]
+        slope = np.bincount(doy, dx * (v - mean[doy]), 366) / np.bincount(doy, dx * dx, 366)
+
+        # Share of each day's values above mean + 2*std
+        extreme = v > (mean + 2 * std)[doy]
+        p_extreme = np.bincount(doy[extreme], minlength=366) / n
+
+    return np.column_stack([mean, std, vmax, vmin, slope, p_extreme])
+
+# Chart rendering (cached so reruns skip matplotlib)
+def _export_fig(fig, fmt):
+    # SVG for on-screen display, PNG only for the ZIP export
+    if fmt == "svg":
+        buf = io.StringIO()
+        fig.savefig(buf, format="svg", bbox_inches="tight")
+    else:
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
+    return buf.getvalue()
+
+def downsample_minmax(x, y, n_out=800, threshold=2000):
+    # Keep each bucket's min and max so peaks survive; no-op for short series
+    if len(y) <= threshold:
+        return x, y
+    size = len(y) // (n_out // 2)
+    n = size * (n_out // 2)
+    buckets = y[:n].reshape(-1, size)
+    offsets = np.arange(0, n, size)
+    lo = np.where(np.isnan(buckets), np.inf, buckets).argmin(axis=1) + offsets
+    hi = np.where(np.isnan(buckets), -np.inf, buckets).argmax(axis=1) + offsets
+    keep = np.unique(np.concatenate([lo, hi, np.arange(n, len(y))]))
+    return x[keep], y[keep]
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def render_trend_chart(years, values, mean_val, unit, fmt="svg"):
+    fig = Figure(figsize=(4.2, 2.6))
+    ax = fig.subplots()
+    ax.plot(*downsample_minmax(years, values), marker="o")
+    ax.axhline(mean_val, linestyle="--")
+    ax.set_xlabel("Year")
+    ax.set_ylabel(unit)
+    return _export_fig(fig, fmt)
 
-def build_dataframe(json_resp, parameter):
-    data = json_resp.get("properties", {}).get("parameter", {}).get(parameter, {})
-    records = [{"date": pd.to_datetime(k), parameter: v} for k, v in data.items()]
-    return pd.DataFrame(records).sort_values("date").reset_index(drop=True)
+@st.cache_data(show_spinner=False, max_entries=64)
+def render_bell_chart(mean_val, std_val, unit, fmt="svg"):
+    x = np.linspace(mean_val - 4 * std_val, mean_val + 4 * std_val, 200)
+    y = np.exp(-0.5 * ((x - mean_val) / std_val) ** 2) / (std_val * np.sqrt(2 * np.pi))
+    fig = Figure(figsize=(4.2, 2.6))
+    ax = fig.subplots()
+    ax.plot(x, y)
+    ax.axvline(mean_val, linestyle="--")
+    ax.fill_between(x, y, alpha=0.3)
+    ax.set_xlabel(unit)
+    return _export_fig(fig, fmt)
 
 # Analysis
 year_start = 1991
 year_end = datetime.today().year
+lat, lon = snap_to_power_grid(lat, lon, var)
 
-json_data = fetch_power_point(lat, lon, year_start, year_end, var)
-df = build_dataframe(json_data, var)
-
-df["doy"] = df["date"].dt.dayofyear
-selected = df[df["doy"] == date_in.timetuple().tm_yday]
-
-values = selected[var].dropna()
-mean_val = values.mean()
-std_val = values.std(ddof=0)
-max_val = values.max()
-min_val = values.min()
-
-prob_extreme = (values > mean_val + 2 * std_val).mean()
-slope = np.polyfit(selected["date"].dt.year, selected[var], 1)[0]
-trend_text = "increasing" if slope > 0 else "decreasing" if slope < 0 else "stable"
-
-
-# Weather Insight (Main Highlight)
-st.markdown('<div class="insight-card">', unsafe_allow_html=True)
-st.markdown(f"""
+# The day picker lives inside this fragment, so changing the day reruns only
+# this section against the already loaded dataframe
+@st.fragment
+def day_analysis(df):
+    date_in = st.date_input("Day of Year", datetime.today())
+    doy = date_in.timetuple().tm_yday
+    selected = df.iloc[doy_index(lat, lon, year_start, year_end, var)[doy]]
+    mean_val, std_val, max_val, min_val, slope, prob_extreme = doy_stats(lat, lon, year_start, year_end, var)[doy - 1]
+    trend_text = "increasing" if slope > 0 else "decreasing" if slope < 0 else "stable"
+
+    # Weather Insight (Main Highlight)
+    st.markdown('<div class="insight-card">', unsafe_allow_html=True)
+    st.markdown(f"""
 ### 🌤️ Weather Insight for {location_input}
 
 On **{date_in.strftime('%B %d')}**, **{var_choice.lower()}** has shown a **{trend_text} pattern** over the last three decades.
@@ -250,76 +362,67 @@ On **{date_in.strftime('%B %d')}**, **{var_choice.lower()}** has shown a **{tren
 
 This means the selected day is **historically {'more volatile' if prob_extreme > 0.15 else 'generally stable'}**, based on NASA observations.
 """)
-st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    # Metrics
+    st.markdown('<div class="section-card">', unsafe_allow_html=True)
+    st.subheader("📊 Key Statistics")
+
+    c1, c2, c3 = st.columns(3)
+    c1.markdown(f"<div class='metric-box'><h4>Average</h4><h2>{mean_val:.2f} {unit}</h2></div>", unsafe_allow_html=True)
+    c2.markdown(f"<div class='metric-box'><h4>Maximum</h4><h2>{max_val:.2f} {unit}</h2></div>", unsafe_allow_html=True)
+    c3.markdown(f"<div class='metric-box'><h4>Minimum</h4><h2>{min_val:.2f} {unit}</h2></div>", unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-# Metrics
-st.markdown('<div class="section-card">', unsafe_allow_html=True)
-st.subheader("📊 Key Statistics")
+    trend_years = selected["date"].dt.year.to_numpy()
+    trend_values = selected[var].to_numpy()
 
-c1, c2, c3 = st.columns(3)
-c1.markdown(f"<div class='metric-box'><h4>Average</h4><h2>{mean_val:.2f} {unit}</h2></div>", unsafe_allow_html=True)
-c2.markdown(f"<div class='metric-box'><h4>Maximum</h4><h2>{max_val:.2f} {unit}</h2></div>", unsafe_allow_html=True)
-c3.markdown(f"<div class='metric-box'><h4>Minimum</h4><h2>{min_val:.2f} {unit}</h2></div>", unsafe_allow_html=True)
-st.markdown('</div>', unsafe_allow_html=True)
+    # Visualizations 
+    colA, colB = st.columns(2)
 
+    with colA:
+        st.markdown('<div class="section-card">', unsafe_allow_html=True)
+        st.subheader("📈 Long-term Trend")
+        st.image(render_trend_chart(trend_years, trend_values, mean_val, unit), width="stretch")
+        st.markdown('</div>', unsafe_allow_html=True)
 
-# Visualizations 
-colA, colB = st.columns(2)
+    with colB:
+        st.markdown('<div class="section-card">', unsafe_allow_html=True)
+        st.subheader("🔔 Probability Distribution")
+        st.image(render_bell_chart(mean_val, std_val, unit), width="stretch")
+        st.markdown('</div>', unsafe_allow_html=True)
 
-with colA:
+    # Historical Data
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
-    st.subheader("📈 Long-term Trend")
-    fig, ax = plt.subplots(figsize=(4.2, 2.6))
-    ax.plot(selected["date"].dt.year, selected[var], marker="o")
-    ax.axhline(mean_val, linestyle="--")
-    ax.set_xlabel("Year")
-    ax.set_ylabel(unit)
-    st.pyplot(fig)
+    st.subheader("📄 Historical Values")
+    table_df = pd.DataFrame({
+        "date": selected["date"].dt.date,
+        f"{var_choice} [{unit}]": selected[var].to_numpy(),
+    })
+    st.dataframe(table_df, width="stretch")
     st.markdown('</div>', unsafe_allow_html=True)
 
-with colB:
+    # Downloadables
+    csv_buf = pa.BufferOutputStream()
+    pacsv.write_csv(pa.Table.from_pandas(table_df, preserve_index=False), csv_buf)
+    csv_data = csv_buf.getvalue().to_pybytes()
+
+    zip_buf = io.BytesIO()
+    with zipfile.ZipFile(zip_buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as z:
+        z.writestr("historical_data.csv", csv_data)
+        # PNGs are already compressed, store them as-is
+        z.writestr("trend.png", render_trend_chart(trend_years, trend_values, mean_val, unit, fmt="png"),
+                   compress_type=zipfile.ZIP_STORED)
+        z.writestr("distribution.png", render_bell_chart(mean_val, std_val, unit, fmt="png"),
+                   compress_type=zipfile.ZIP_STORED)
+    zip_buf.seek(0)
+
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
-    st.subheader("🔔 Probability Distribution")
-    x = np.linspace(mean_val - 4 * std_val, mean_val + 4 * std_val, 200)
-    y = norm.pdf(x, mean_val, std_val)
-    fig2, ax2 = plt.subplots(figsize=(4.2, 2.6))
-    ax2.plot(x, y)
-    ax2.axvline(mean_val, linestyle="--")
-    ax2.fill_between(x, y, alpha=0.3)
-    ax2.set_xlabel(unit)
-    st.pyplot(fig2)
+    st.subheader("📦 Export Results")
+
+    d1, d2 = st.columns(2)
+    d1.download_button("📥 Download CSV Data", csv_data, "nasa_weather_data.csv", on_click="ignore")
+    d2.download_button("🖼️ Download Charts (ZIP)", zip_buf, "nasa_weather_visuals.zip", on_click="ignore")
     st.markdown('</div>', unsafe_allow_html=True)
 
-# Historical Data
-st.markdown('<div class="section-card">', unsafe_allow_html=True)
-st.subheader("📄 Historical Values")
-selected["date"] = selected["date"].dt.strftime("%Y-%m-%d")
-table_df = selected[["date", var]].rename(columns={var: f"{var_choice} [{unit}]"})
-st.dataframe(table_df, use_container_width=True)
-st.markdown('</div>', unsafe_allow_html=True)
-
-# Downloadables
-csv_data = table_df.to_csv(index=False)
-
-trend_buf = io.BytesIO()
-fig.savefig(trend_buf, format="png", dpi=150, bbox_inches="tight")
-trend_buf.seek(0)
-
-bell_buf = io.BytesIO()
-fig2.savefig(bell_buf, format="png", dpi=150, bbox_inches="tight")
-bell_buf.seek(0)
-
-zip_buf = io.BytesIO()
-with zipfile.ZipFile(zip_buf, "w") as z:
-    z.writestr("historical_data.csv", csv_data)
-    z.writestr("trend.png", trend_buf.getvalue())
-    z.writestr("distribution.png", bell_buf.getvalue())
-zip_buf.seek(0)
-
-st.markdown('<div class="section-card">', unsafe_allow_html=True)
-st.subheader("📦 Export Results")
-
-d1, d2 = st.columns(2)
-d1.download_button("📥 Download CSV Data", csv_data, "nasa_weather_data.csv")
-d2.download_button("🖼️ Download Charts (ZIP)", zip_buf, "nasa_weather_visuals.zip")
-st.markdown('</div>', unsafe_allow_html=True)
+day_analysis(build_dataframe(lat, lon, year_start, year_end, var))